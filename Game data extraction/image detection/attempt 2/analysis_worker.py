@@ -0,0 +1,216 @@
+# analysis_worker.py
+# Capture and analysis run in a separate process so that screen grabs, OCR and
+# detection never compete with the tkinter mainloop of main.py for the GIL.
+# Results are sent back to the GUI process through a multiprocessing queue.
+import time
+import hashlib
+import logging
+import queue
+import threading
+import traceback
+import pyautogui
+import pygetwindow as gw
+import cv2
+import numpy as np
+
+# mss grabs the screen straight into a BGRA buffer; pyautogui is the fallback
+try:
+    import mss
+except ImportError:
+    mss = None
+
+# Fast hash for frame signatures; hashlib's blake2b is used without it
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+# ----------------------- Global Variables -----------------------
+# Only the latest results matter to the GUI: the oldest message is evicted when it lags
+RESULT_QUEUE_SIZE = 2
+# How often a paused worker checks whether the analysis was restarted (seconds)
+PAUSED_POLL_INTERVAL = 0.5
+# Shortest pause between two iterations, even when analysis overran the interval (seconds)
+MIN_LOOP_PAUSE = 0.02
+# Longest wait for the oldest queued message when evicting it (seconds)
+EVICT_TIMEOUT = 0.05
+
+# mss handles are not shareable between threads: one per capturing thread
+_capture_local = threading.local()
+
+
+# ----------------------- Capture Functions -----------------------
+def find_game_window():
+    """
+    Searches for the "Mini Metro" game window and activates it.
+    Returns the window if found; otherwise, returns None.
+    """
+    windows = gw.getWindowsWithTitle("Mini Metro")
+    for w in windows:
+        if w.title.strip() == "Mini Metro":
+            try:
+                w.activate()
+                time.sleep(0.1)
+            except Exception as e:
+                logging.error(f"Error activating game window: {e}", exc_info=True)
+            return w
+    return None
+
+
+def get_window_box(window):
+    """
+    Returns the current (left, top, width, height) of a window found by
+    find_game_window, or None if it has been closed.
+    Reading the geometry is cheap, so moves and resizes are followed without
+    searching for the window again.
+    """
+    try:
+        return (window.left, window.top, window.width, window.height)
+    except Exception:
+        return None
+
+
+def get_screen_grabber():
+    """
+    Returns the mss instance of the calling thread, creating it on first use.
+    """
+    sct = getattr(_capture_local, "sct", None)
+    if sct is None:
+        sct = mss.mss()
+        _capture_local.sct = sct
+    return sct
+
+
+def is_window_visible(window):
+    """
+    True when the game window can be captured, i.e. not minimized.
+    Focus is not required: the analyzer's own window takes it whenever the
+    user clicks one of its buttons, while the game stays on screen.
+    """
+    try:
+        return not window.isMinimized
+    except Exception:
+        return False
+
+
+def get_frame_buffer(height, width):
+    """
+    Returns the calling thread's BGR frame buffer, reallocated only when the
+    window size changes. A captured frame is therefore only valid until the
+    next capture of the same thread, which is how analysis_loop uses it.
+    """
+    frame = getattr(_capture_local, "frame", None)
+    if frame is None or frame.shape[:2] != (height, width):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        _capture_local.frame = frame
+    return frame
+
+
+def capture_game_window(window_box):
+    """
+    Captures a screenshot of the specified window region.
+    Returns an OpenCV BGR image, or None if an error occurs.
+    """
+    try:
+        if mss is not None:
+            left, top, width, height = window_box
+            raw = get_screen_grabber().grab({"left": left, "top": top, "width": width, "height": height})
+            # View over the BGRA bytes of the grab, no PIL image in between
+            bgra = np.frombuffer(raw.raw, dtype=np.uint8).reshape(raw.height, raw.width, 4)
+            return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=get_frame_buffer(raw.height, raw.width))
+        screenshot = pyautogui.screenshot(region=window_box)
+        image = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+        return image
+    except Exception as e:
+        logging.error(f"Error capturing window: {e}", exc_info=True)
+        return None
+
+
+def frame_signature(image):
+    """
+    Cheap signature of a frame, computed on every 16th pixel of every 16th row.
+    Two frames with the same signature are treated as identical.
+    """
+    sample = np.ascontiguousarray(image[::16, ::16])
+    if xxhash is not None:
+        return image.shape, xxhash.xxh64(sample).intdigest()
+    return image.shape, hashlib.blake2b(sample.tobytes(), digest_size=8).digest()
+
+
+# ----------------------- Worker Process -----------------------
+def post_result(results, kind, payload=None):
+    """
+    Sends a (kind, payload) message to the GUI process.
+    When the queue is full (the GUI is behind), the oldest message is
+    evicted so the GUI receives the latest one. The queue's feeder thread may
+    not have flushed it to the pipe yet, so the eviction waits up to
+    EVICT_TIMEOUT; if the queue is still full after it, the new message is dropped.
+    """
+    try:
+        results.put((kind, payload), block=False)
+        return
+    except queue.Full:
+        pass
+    try:
+        results.get(timeout=EVICT_TIMEOUT)
+    except queue.Empty:
+        pass
+    try:
+        results.put((kind, payload), block=False)
+    except queue.Full:
+        pass
+
+
+def analysis_loop(results, running, interval, regions):
+    """
+    Body of the analysis process.
+    While the running event is set, captures the game window, analyzes it and
+    posts the result. Iterations start every interval.value milliseconds:
+    the time spent capturing and analyzing is deducted from the wait.
+    Messages are ("data", analysis), ("no_window", None), ("hidden", None),
+    ("capture_failed", None) or ("error", (message, traceback)).
+    """
+    # Imported here so the GUI process, which only imports this module for
+    # the queue size and the process target, does not load the detectors
+    # (OCR engine, detector thread pool, numba functions)
+    from detectors_py import analyze_game_image
+
+    # The game window is searched for (and activated) only when it is not
+    # known yet or after a failed capture, not on every frame
+    game_window = None
+    last_frame_signature = None
+    last_analysis = None
+    while True:
+        if not running.wait(PAUSED_POLL_INTERVAL):
+            continue
+        started = time.monotonic()
+
+        if game_window is None:
+            game_window = find_game_window()
+        window_box = get_window_box(game_window) if game_window is not None else None
+        if window_box is None:
+            game_window = None
+            post_result(results, "no_window")
+        elif not is_window_visible(game_window):
+            # Minimized: nothing to analyze, the GUI keeps the last
+            # values and shows that the analysis is paused
+            post_result(results, "hidden")
+        else:
+            try:
+                image = capture_game_window(window_box)
+                if image is None:
+                    game_window = None
+                    post_result(results, "capture_failed")
+                else:
+                    signature = frame_signature(image)
+                    if signature != last_frame_signature or last_analysis is None:
+                        last_analysis = analyze_game_image(image, window_box[2], window_box[3], regions)
+                        last_frame_signature = signature
+                    # Unchanged frame (paused game, menu...): the previous analysis is sent again
+                    post_result(results, "data", last_analysis)
+            except Exception as e:
+                post_result(results, "error", (str(e), traceback.format_exc()))
+
+        elapsed = time.monotonic() - started
+        time.sleep(max(MIN_LOOP_PAUSE, interval.value / 1000 - elapsed))
@@ -194,8 +194,6 @@ std::vector<py::dict> detect_placed_lines(const cv::Mat& image, int win_width, i
     std::vector<py::dict> consolidated_lines;
     cv::Rect abs_region = get_absolute_region(region, win_width, win_height);
     cv::Mat roi = image(abs_region);
-    cv::Mat hsv;
-    cv::cvtColor(roi, hsv, cv::COLOR_BGR2HSV);
 
     int w = roi.cols;
     int min_line_width = static_cast<int>(0.005 * w);
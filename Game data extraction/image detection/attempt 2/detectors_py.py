@@ -1,14 +1,139 @@
 # detectors.py
+import atexit
+import functools
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 import cv2
 import numpy as np
-import pytesseract
-from scipy.spatial import distance
+from scipy.spatial import cKDTree
+
+# The scalar shape classifier is compiled with numba when it is installed;
+# otherwise njit is a no-op and the same functions run as plain Python.
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Digit-only OCR. A single in-process tesserocr handle is kept for the whole
+# session so the traineddata is loaded once instead of spawning a tesseract
+# process per call; pytesseract is used when tesserocr is not available.
+OCR_CONFIG = "--psm 7 -c tessedit_char_whitelist=0123456789"
+# Several counters stacked vertically are read as one block of lines
+OCR_BLOCK_CONFIG = "--psm 6 -c tessedit_char_whitelist=0123456789"
+# Keep tesseract single-threaded (must be set before it is loaded). The OCR
+# crops are tiny (the wagon counter is about 2% x 3% of the window), far below
+# the size where OpenMP's fork/join cost pays off, and the detectors already
+# run in parallel threads so extra OpenMP threads would only oversubscribe.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+try:
+    from PIL import Image
+    from tesserocr import PyTessBaseAPI, PSM
+    _OCR_API = PyTessBaseAPI(psm=PSM.SINGLE_LINE)
+    _OCR_API.SetVariable("tessedit_char_whitelist", "0123456789")
+    # Release the engine and its traineddata on a normal interpreter exit
+    atexit.register(_OCR_API.End)
+except (ImportError, RuntimeError):
+    import pytesseract
+    _OCR_API = None
+# The tesseract API is not thread-safe
+_OCR_LOCK = threading.Lock()
+_NON_DIGITS = re.compile(r"\D")
+
+# OCR results keyed by a hash of the thresholded ROI (least recently used first)
+OCR_CACHE_SIZE = 256
+_ocr_cache = OrderedDict()
+_ocr_cache_lock = threading.Lock()
+
+# ROIs at least this tall are halved before OCR and circle detection: digits and
+# line indicators stay legible at half resolution and both steps scale with area
+DOWNSCALE_MIN_HEIGHT = 80
+
+# Hue bands of the train colors: red, orange and yellow (0-35), blue (100-130)
+# and the reds on the other side of OpenCV's hue wrap at 180 (170-179). All
+# bands share the same saturation/value floor, so a 256-entry table over the
+# hue channel tests every band at once and one inRange applies the floor.
+_TRAIN_HUE_BANDS = ((0, 35), (100, 130), (170, 179))
+_TRAIN_HUE_LUT = np.zeros(256, dtype=np.uint8)
+for _low, _high in _TRAIN_HUE_BANDS:
+    _TRAIN_HUE_LUT[_low:_high + 1] = 255
+_TRAIN_SV_LOWER = np.array([0, 100, 100], dtype=np.uint8)
+_TRAIN_SV_UPPER = np.array([255, 255, 255], dtype=np.uint8)
+
+# Below this many foreground pixels a binary map mask cannot hold a station,
+# line or train, so the contour search is skipped (e.g. blank menu screens)
+MIN_FOREGROUND_PIXELS = 50
+
+# Scale at which analyze_game_image searches the map for stations. Station
+# icons stay well above the size limits at half resolution; trains and placed
+# lines are kept at full resolution because thin segments and small trains
+# merge or split when resized
+STATION_DETECTION_SCALE = 0.5
+
+# Whole-frame color conversions go through OpenCL (cv2.UMat) when OpenCV
+# has a usable device, e.g. an integrated GPU
+USE_OPENCL = cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+
+# Shared pool running the independent detectors of analyze_game_image concurrently
+# (OpenCV and tesseract release the GIL during their heavy work)
+_DETECTOR_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="detector")
+
+@dataclass
+class TrackedSet:
+    """
+    Objects kept between frames for one object type. Positions, ids and ages
+    are parallel NumPy arrays so the tracker matches on contiguous memory;
+    objects holds the matching detection dictionaries in the same order.
+    """
+    xy: np.ndarray = field(default_factory=lambda: np.empty((0, 2), dtype=np.float64))
+    ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    ages: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    objects: list = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.objects)
+
+# Default detection regions (x, y, width, height as fractions of the window)
+DEFAULT_REGIONS = {
+    "score_region": (0.80, 0.00, 0.18, 0.10),
+    "train_region": (0.10, 0.85, 0.20, 0.10),
+    "tunnel_region": (0.70, 0.85, 0.20, 0.10),
+    "lines_region": (0.35, 0.85, 0.30, 0.10),
+    "station_map_region": (0.00, 0.00, 1.00, 0.80),
+    "wagon_region": (0.10, 0.75, 0.20, 0.10)
+}
+
+# OCR counters of analyze_game_image: result key -> region key
+OCR_FIELDS = (
+    ('score', 'score_region'),
+    ('available_trains', 'train_region'),
+    ('available_tunnels', 'tunnel_region'),
+    ('available_wagons', 'wagon_region'),
+)
+
+# The resource counters only change when a weekly reward is picked, so
+# analyze_game_image re-reads them once every RESOURCE_OCR_INTERVAL frames and
+# reuses the last values in between (the score is read on every frame)
+RESOURCE_OCR_INTERVAL = 5
+RESOURCE_FIELDS = ('available_trains', 'available_tunnels', 'available_wagons')
+_resource_state = {"frame": 0, "values": {}}
+
+# Scratch arrays reused from one frame to the next, one set per thread since
+# the detectors run concurrently
+_scratch = threading.local()
 
 # Global dictionary to store previously detected objects for tracking
 previous_objects = {
-    'stations': [],
-    'trains': [],
-    'passengers': []
+    'stations': TrackedSet(),
+    'trains': TrackedSet(),
+    'passengers': TrackedSet()
 }
 
 def get_absolute_region(relative_region, win_width, win_height):
@@ -16,6 +141,15 @@ def get_absolute_region(relative_region, win_width, win_height):
     Converts a region defined in percentages (x, y, width, height)
     into absolute pixel coordinates.
     """
+    # Regions loaded from JSON are lists; the cache needs a hashable key
+    return _absolute_region(tuple(relative_region), win_width, win_height)
+
+@functools.lru_cache(maxsize=64)
+def _absolute_region(relative_region, win_width, win_height):
+    """
+    Cached conversion behind get_absolute_region: the regions and the window
+    size rarely change between frames.
+    """
     x_percent, y_percent, w_percent, h_percent = relative_region
     x = int(x_percent * win_width)
     y = int(y_percent * win_height)
@@ -23,7 +157,237 @@ def get_absolute_region(relative_region, win_width, win_height):
     h = int(h_percent * win_height)
     return (x, y, w, h)
 
-def detect_score(image, win_width, win_height, region=None):
+def _buffer(name, shape, dtype=np.uint8):
+    """
+    Returns the calling thread's scratch array called name, allocating it only
+    when it does not exist yet or its shape/dtype changed (window resized).
+    The content is not initialized.
+    """
+    buffers = getattr(_scratch, "buffers", None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    buf = buffers.get(name)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = np.empty(shape, dtype=dtype)
+        buffers[name] = buf
+    return buf
+
+def _resize_map(roi, scale, name):
+    """
+    Resizes a map ROI by scale for detect_stations (no-op when scale is 1),
+    into the calling thread's scratch buffer called name.
+    """
+    if scale == 1.0:
+        return roi
+    # Same rounding as OpenCV's own output size (round half to even), so the
+    # buffer is used as is rather than reallocated by cv2.resize
+    shape = (round(roi.shape[0] * scale), round(roi.shape[1] * scale)) + roi.shape[2:]
+    return cv2.resize(roi, None, dst=_buffer(name, shape), fx=scale, fy=scale,
+                      interpolation=cv2.INTER_AREA)
+
+def _convert_frame(image):
+    """
+    Returns the gray and HSV versions of the whole frame.
+    With OpenCL the frame is uploaded once and both conversions run on the
+    device; the results are downloaded because the detectors work on numpy
+    slices of them.
+    """
+    if USE_OPENCL:
+        frame = cv2.UMat(image)
+        return (cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY).get(),
+                cv2.cvtColor(frame, cv2.COLOR_BGR2HSV).get())
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=_buffer("frame_gray", image.shape[:2]))
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=_buffer("frame_hsv", image.shape))
+    return gray, hsv
+
+def _gray_roi(image, gray, x, y, w, h):
+    """
+    Returns the grayscale version of an image region, slicing the frame-wide
+    conversion when one is provided instead of converting the region again.
+    """
+    if gray is not None:
+        return gray[y:y+h, x:x+w]
+    return cv2.cvtColor(image[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY)
+
+def _hsv_roi(image, hsv, x, y, w, h):
+    """
+    Same as _gray_roi for the HSV color space.
+    """
+    if hsv is not None:
+        return hsv[y:y+h, x:x+w]
+    return cv2.cvtColor(image[y:y+h, x:x+w], cv2.COLOR_BGR2HSV)
+
+@functools.lru_cache(maxsize=8)
+def _line_params(w):
+    """
+    Width thresholds of placed lines for a map region w pixels wide:
+    (min line width, max line width, river width).
+    """
+    return int(0.005 * w), int(0.015 * w), int(0.03 * w)
+
+@functools.lru_cache(maxsize=8)
+def _line_indicator_params(w, factor):
+    """
+    Hough radii (at the downscaled resolution) and placed-line radius threshold
+    for a line indicator region w pixels wide: (min radius, max radius, placed radius).
+    """
+    return int(0.03 * w / factor), int(0.15 * w / factor), int(0.12 * w)
+
+def _downscale(roi):
+    """
+    Halves an ROI when it is at least DOWNSCALE_MIN_HEIGHT pixels tall.
+    Returns the (possibly) resized ROI and the factor to scale coordinates back up.
+    """
+    if roi.shape[0] < DOWNSCALE_MIN_HEIGHT:
+        return roi, 1
+    return cv2.resize(roi, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA), 2
+
+def _ocr_binary(image, gray, x, y, w, h):
+    """
+    Binarizes an OCR region with Otsu's threshold: the digits and their
+    background are split wherever the region's histogram separates them, so
+    the same code works however bright the UI is drawn.
+    The result is always dark text on a light background (the polarity
+    tesseract reads best), so light-on-dark counters hash to the same OCR
+    cache key as their dark-on-light equivalent.
+    Uses the frame-wide gray image when given, otherwise converts the region.
+    """
+    if gray is not None:
+        roi, _ = _downscale(gray[y:y+h, x:x+w])
+    else:
+        roi, _ = _downscale(cv2.cvtColor(image[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY))
+    _, thresh = cv2.threshold(roi, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    # Mostly black means a dark background: flip it
+    if cv2.countNonZero(thresh) < thresh.size // 2:
+        cv2.bitwise_not(thresh, dst=thresh)
+    return thresh
+
+def _contour_mean_color(roi, cnt):
+    """
+    Returns the mean BGR color inside a contour.
+    The mask only covers the contour's bounding box rather than the whole ROI,
+    so the cost scales with the contour size instead of the frame size.
+    """
+    bx, by, bw, bh = cv2.boundingRect(cnt)
+    mask = np.zeros((bh, bw), dtype=np.uint8)
+    cv2.drawContours(mask, [cnt], -1, 255, -1, offset=(-bx, -by))
+    return cv2.mean(roi[by:by+bh, bx:bx+bw], mask=mask)[:3]
+
+def _ocr_digits(thresh):
+    """
+    Runs single-line, digits-only OCR on a binary image and returns the raw text.
+    """
+    if _OCR_API is None:
+        return pytesseract.image_to_string(thresh, config=OCR_CONFIG)
+    with _OCR_LOCK:
+        _OCR_API.SetImage(Image.fromarray(thresh))
+        return _OCR_API.GetUTF8Text()
+
+def _ocr_digit_lines(strip):
+    """
+    Runs digits-only OCR on a block of stacked text lines and returns the
+    non-empty lines of the result.
+    """
+    if _OCR_API is None:
+        text = pytesseract.image_to_string(strip, config=OCR_BLOCK_CONFIG)
+    else:
+        with _OCR_LOCK:
+            _OCR_API.SetPageSegMode(PSM.SINGLE_BLOCK)
+            try:
+                _OCR_API.SetImage(Image.fromarray(strip))
+                text = _OCR_API.GetUTF8Text()
+            finally:
+                _OCR_API.SetPageSegMode(PSM.SINGLE_LINE)
+    return [line for line in text.splitlines() if line.strip()]
+
+def _ocr_strip(threshes, gap=10):
+    """
+    Stacks binary crops from _ocr_binary (dark text on white) into one image,
+    separated and padded by white rows so tesseract sees one line per crop.
+    """
+    width = max(t.shape[1] for t in threshes) + 2 * gap
+    parts = []
+    for t in threshes:
+        parts.append(cv2.copyMakeBorder(t, gap, gap, gap, width - gap - t.shape[1],
+                                        cv2.BORDER_CONSTANT, value=255))
+    return np.vstack(parts)
+
+def _ocr_cache_key(thresh):
+    return (thresh.shape, hashlib.blake2b(thresh.tobytes(), digest_size=8).digest())
+
+def _ocr_cache_get(key):
+    """
+    Returns the cached value for key (marking it as recently used), or None.
+    """
+    with _ocr_cache_lock:
+        if key in _ocr_cache:
+            _ocr_cache.move_to_end(key)
+            return _ocr_cache[key]
+    return None
+
+def _ocr_cache_put(key, value):
+    with _ocr_cache_lock:
+        _ocr_cache[key] = value
+        if len(_ocr_cache) > OCR_CACHE_SIZE:
+            _ocr_cache.popitem(last=False)
+
+def _cached_ocr(func):
+    """
+    Memoizes an OCR reader on a hash of its binary input image.
+    The counters rarely change between frames, so most calls become a lookup
+    instead of a tesseract run. Pass use_cache=False to force a fresh read.
+    """
+    @functools.wraps(func)
+    def wrapper(thresh, use_cache=True):
+        if not use_cache:
+            return func(thresh)
+        key = _ocr_cache_key(thresh)
+        value = _ocr_cache_get(key)
+        if value is None:
+            value = func(thresh)
+            _ocr_cache_put(key, value)
+        return value
+    return wrapper
+
+def _parse_digits(text):
+    """
+    Concatenates every digit of an OCR string into an integer ("1 234" -> 1234).
+    Returns 0 if the text contains no digit.
+    """
+    digits = _NON_DIGITS.sub("", text)
+    return int(digits) if digits else 0
+
+@_cached_ocr
+def _read_number(thresh):
+    """
+    Reads an integer from a thresholded ROI. Returns 0 if no digit is found.
+    """
+    return _parse_digits(_ocr_digits(thresh))
+
+def _read_numbers(threshes):
+    """
+    Reads an integer from each of several thresholded ROIs.
+    Cached values are reused and all the misses are read with a single
+    tesseract call on a vertical strip of the crops; if that call does not
+    return exactly one line per crop, each crop is read on its own.
+    """
+    keys = [_ocr_cache_key(t) for t in threshes]
+    values = [_ocr_cache_get(key) for key in keys]
+    misses = [i for i, value in enumerate(values) if value is None]
+
+    if len(misses) > 1:
+        lines = _ocr_digit_lines(_ocr_strip([threshes[i] for i in misses]))
+        if len(lines) == len(misses):
+            for i, line in zip(misses, lines):
+                values[i] = _parse_digits(line)
+                _ocr_cache_put(keys[i], values[i])
+            misses = []
+
+    for i in misses:
+        values[i] = _read_number(threshes[i])
+    return values
+
+def detect_score(image, win_width, win_height, region=None, use_cache=True, gray=None):
     """
     Detects the score displayed in the top-right corner using OCR.
     Default region: (0.80, 0.00, 0.18, 0.10)
@@ -32,18 +396,10 @@ def detect_score(image, win_width, win_height, region=None):
     if region is None:
         region = (0.80, 0.00, 0.18, 0.10)
     x, y, w, h = get_absolute_region(region, win_width, win_height)
-    roi = image[y:y+h, x:x+w]
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
-    config = "--psm 7 -c tessedit_char_whitelist=0123456789"
-    text = pytesseract.image_to_string(thresh, config=config)
-    digits = ''.join(filter(str.isdigit, text))
-    try:
-        return int(digits)
-    except ValueError:
-        return 0
+    thresh = _ocr_binary(image, gray, x, y, w, h)
+    return _read_number(thresh, use_cache=use_cache)
 
-def detect_available_trains(image, win_width, win_height, region=None):
+def detect_available_trains(image, win_width, win_height, region=None, use_cache=True, gray=None):
     """
     Detects the number of available trains (via OCR) in the bottom-left area.
     Default region: (0.10, 0.85, 0.20, 0.10)
@@ -51,18 +407,10 @@ def detect_available_trains(image, win_width, win_height, region=None):
     if region is None:
         region = (0.10, 0.85, 0.20, 0.10)
     x, y, w, h = get_absolute_region(region, win_width, win_height)
-    roi = image[y:y+h, x:x+w]
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
-    config = "--psm 7 -c tessedit_char_whitelist=0123456789"
-    text = pytesseract.image_to_string(thresh, config=config)
-    digits = ''.join(filter(str.isdigit, text))
-    try:
-        return int(digits)
-    except ValueError:
-        return 0
+    thresh = _ocr_binary(image, gray, x, y, w, h)
+    return _read_number(thresh, use_cache=use_cache)
 
-def detect_available_tunnels(image, win_width, win_height, region=None):
+def detect_available_tunnels(image, win_width, win_height, region=None, use_cache=True, gray=None):
     """
     Detects the number of available tunnels (via OCR) in the bottom-right area.
     Default region: (0.70, 0.85, 0.20, 0.10)
@@ -70,18 +418,10 @@ def detect_available_tunnels(image, win_width, win_height, region=None):
     if region is None:
         region = (0.70, 0.85, 0.20, 0.10)
     x, y, w, h = get_absolute_region(region, win_width, win_height)
-    roi = image[y:y+h, x:x+w]
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
-    config = "--psm 7 -c tessedit_char_whitelist=0123456789"
-    text = pytesseract.image_to_string(thresh, config=config)
-    digits = ''.join(filter(str.isdigit, text))
-    try:
-        return int(digits)
-    except ValueError:
-        return 0
+    thresh = _ocr_binary(image, gray, x, y, w, h)
+    return _read_number(thresh, use_cache=use_cache)
 
-def detect_available_lines(image, win_width, win_height, region=None):
+def detect_available_lines(image, win_width, win_height, region=None, gray=None, hsv=None):
     """
     Detects the metro lines indicator.
     Improved to differentiate between available, locked, and placed lines.
@@ -89,98 +429,162 @@ def detect_available_lines(image, win_width, win_height, region=None):
     if region is None:
         region = (0.35, 0.85, 0.30, 0.10)
     x, y, w, h = get_absolute_region(region, win_width, win_height)
-    roi = image[y:y+h, x:x+w]
-
-    hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    gray = cv2.medianBlur(gray, 5)
+    hsv_roi = _hsv_roi(image, hsv, x, y, w, h)
+    # Circles are searched at reduced resolution (radii and votes scaled to match)
+    gray_roi, factor = _downscale(_gray_roi(image, gray, x, y, w, h))
+    blurred = cv2.medianBlur(gray_roi, 5 if factor == 1 else 3,
+                             dst=_buffer("lines_blurred", gray_roi.shape))
 
-    circles = cv2.HoughCircles(gray, cv2.HOUGH_GRADIENT, 1.2, 20,
-                               param1=50, param2=30,
-                               minRadius=int(0.03 * w), maxRadius=int(0.15 * w))
+    min_radius, max_radius, placed_radius = _line_indicator_params(w, factor)
+    circles = cv2.HoughCircles(blurred, cv2.HOUGH_GRADIENT, 1.2, 20 // factor,
+                               param1=50, param2=30 // factor,
+                               minRadius=min_radius, maxRadius=max_radius)
 
     available = 0
     locked = 0
     placed = 0
 
     if circles is not None:
-        circles = np.uint16(np.around(circles))
-        for c in circles[0]:
-            cx, cy, radius = c[0], c[1], c[2]
-            # Use a small region around the circle to get the average HSV color
-            color_roi = hsv[max(0, cy - 2):min(h, cy + 2), max(0, cx - 2):min(w, cx + 2)]
-            if color_roi.size > 0:
-                avg_color = np.mean(color_roi, axis=(0, 1))
-                # Low saturation indicates a locked (grey) line
-                if avg_color[1] < 50:
-                    locked += 1
-                else:
-                    if radius >= int(0.12 * w):
-                        placed += 1
-                    else:
-                        available += 1
+        circles = np.rint(circles[0] * factor).astype(np.intp)
+        # Saturation at every circle center in one indexing operation
+        sats = hsv_roi[circles[:, 1].clip(0, hsv_roi.shape[0] - 1),
+                       circles[:, 0].clip(0, hsv_roi.shape[1] - 1), 1]
+        # Low saturation indicates a locked (grey) line
+        locked_mask = sats < 50
+        placed_mask = ~locked_mask & (circles[:, 2] >= placed_radius)
+        locked = int(np.count_nonzero(locked_mask))
+        placed = int(np.count_nonzero(placed_mask))
+        available = len(circles) - locked - placed
 
     return {"available": available, "locked": locked, "placed": placed}
 
 # -----------------------------------------------------------
 # Object Tracking Functions
 # -----------------------------------------------------------
+def _positions(objects):
+    """
+    Returns the (x, y) centers of a list of detections as an (N, 2) array.
+    """
+    coords = np.fromiter((c for obj in objects for c in (obj['x'], obj['y'])),
+                         dtype=np.float64, count=2 * len(objects))
+    return coords.reshape(-1, 2)
+
 def track_objects(new_objects, object_type):
     """
     Tracks objects between frames by associating new objects with previous ones.
+    Each previous object is matched to its nearest new object within 30 pixels
+    using a KD-tree; when several previous objects claim the same new object,
+    the closest one keeps it.
     """
     global previous_objects
 
-    if not previous_objects[object_type]:
-        previous_objects[object_type] = new_objects
-        return new_objects
+    prev = previous_objects[object_type]
+    new_xy = _positions(new_objects)
 
-    tracked_objects = []
-    used_indices = set()
-
-    for prev_obj in previous_objects[object_type]:
-        # Compute distances between the previous object and each new object
-        distances = [distance.euclidean(
-            (prev_obj['x'], prev_obj['y']),
-            (new_obj['x'], new_obj['y'])
-        ) for new_obj in new_objects]
-
-        if not distances:
-            continue
+    if not len(prev):
+        for i, new_obj in enumerate(new_objects):
+            new_obj['id'] = i
+            new_obj['age'] = 1
+        previous_objects[object_type] = TrackedSet(new_xy, np.arange(len(new_objects)),
+                                                   np.ones(len(new_objects), dtype=np.int64),
+                                                   list(new_objects))
+        return new_objects
 
-        min_idx = np.argmin(distances)
-        min_dist = distances[min_idx]
+    if not new_objects:
+        previous_objects[object_type] = TrackedSet()
+        return []
+
+    # Nearest new object for each previous one (idx == len(new_objects) when none is close enough)
+    dists, idxs = cKDTree(new_xy).query(prev.xy, distance_upper_bound=30)
+    valid = dists < 30
+
+    # Resolve conflicts: among previous objects pointing to the same new object,
+    # only the one with the smallest distance keeps the match
+    order = np.lexsort((dists, idxs))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = idxs[order][1:] != idxs[order][:-1]
+    winner = np.zeros(len(prev), dtype=bool)
+    winner[order] = first
+    matched = valid & winner
+    matched_idxs = idxs[matched]
+
+    # Matched objects inherit id and age; the others are new
+    new_ids = len(prev) + np.arange(len(new_objects))
+    new_ages = np.ones(len(new_objects), dtype=np.int64)
+    new_ids[matched_idxs] = prev.ids[matched]
+    new_ages[matched_idxs] = prev.ages[matched] + 1
+    used = np.zeros(len(new_objects), dtype=bool)
+    used[matched_idxs] = True
+    for new_obj, obj_id, age in zip(new_objects, new_ids.tolist(), new_ages.tolist()):
+        new_obj['id'] = obj_id
+        new_obj['age'] = age
 
-        # If the distance is reasonable and this new object is not yet associated
-        if min_dist < 30 and min_idx not in used_indices:
-            tracked_obj = new_objects[min_idx].copy()
-            tracked_obj['id'] = prev_obj['id']
-            tracked_obj['age'] = prev_obj['age'] + 1
-            tracked_objects.append(tracked_obj)
-            used_indices.add(min_idx)
-        else:
+    tracked_objects = []
+    for prev_obj, is_matched, idx, age in zip(prev.objects, matched, idxs, prev.ages):
+        if is_matched:
+            tracked_objects.append(new_objects[idx])
+        elif age > 2:  # Ignore objects that just appeared and disappeared quickly
             # The object has disappeared
-            if prev_obj['age'] > 2:  # Ignore objects that just appeared and disappeared quickly
-                prev_obj['missing'] = True
-                tracked_objects.append(prev_obj)
+            prev_obj['missing'] = True
+            tracked_objects.append(prev_obj)
 
     # Add new objects that were not associated
-    for i, new_obj in enumerate(new_objects):
-        if i not in used_indices:
-            new_obj['id'] = len(previous_objects[object_type]) + i
-            new_obj['age'] = 1
-            tracked_objects.append(new_obj)
+    unmatched = np.flatnonzero(~used)
+    tracked_objects.extend(new_objects[i] for i in unmatched)
 
-    previous_objects[object_type] = [obj for obj in tracked_objects if not obj.get('missing', False)]
+    kept = np.concatenate([matched_idxs, unmatched])
+    previous_objects[object_type] = TrackedSet(new_xy[kept], new_ids[kept], new_ages[kept],
+                                               [new_objects[i] for i in kept])
     return tracked_objects
 
 # -----------------------------------------------------------
 # Station Classification and Passenger Counting
 # -----------------------------------------------------------
-def classify_station_type(station_image):
+# Station type codes returned by the compiled classifier
+STATION_TYPES = ("circle", "triangle", "square", "unknown")
+
+@njit(cache=True)
+def _classify_shape(circularity, vertices):
     """
-    Classifies the station type (circle, triangle, square) using more robust
-    shape features.
+    Maps the shape features of a station contour to a STATION_TYPES index.
+    """
+    if 0.85 <= circularity <= 1.15:
+        return 0
+    elif 0.4 <= circularity <= 0.7 and vertices == 3:
+        return 1
+    elif 0.7 <= circularity <= 0.9 and vertices == 4:
+        return 2
+    elif vertices > 6 and circularity > 0.8:
+        return 0  # Noisy circle contour
+    else:
+        # Fallback decision based on the number of vertices
+        if vertices == 3:
+            return 1
+        elif vertices == 4:
+            return 2
+        elif vertices <= 6:
+            return 0
+        else:
+            return 3
+
+@njit(cache=True)
+def _classify_shapes(circularities, vertices):
+    """
+    Batch version of _classify_shape over arrays of features.
+    A negative vertex count marks an image without contour ("unknown").
+    """
+    codes = np.empty(len(circularities), dtype=np.int64)
+    for i in range(len(circularities)):
+        if vertices[i] < 0:
+            codes[i] = 3
+        else:
+            codes[i] = _classify_shape(circularities[i], vertices[i])
+    return codes
+
+def _station_shape_features(station_image):
+    """
+    Returns (circularity, vertex count) of the largest contour in a station image,
+    or (0.0, -1) when no contour is found.
     """
     if len(station_image.shape) > 2:
         gray = cv2.cvtColor(station_image, cv2.COLOR_BGR2GRAY)
@@ -192,7 +596,7 @@ def classify_station_type(station_image):
     contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
     if not contours:
-        return "unknown"
+        return 0.0, -1
 
     cnt = max(contours, key=cv2.contourArea)
     area = cv2.contourArea(cnt)
@@ -200,31 +604,17 @@ def classify_station_type(station_image):
     circularity = (4 * np.pi * area) / (perimeter * perimeter) if perimeter > 0 else 0
     epsilon = 0.04 * perimeter
     approx = cv2.approxPolyDP(cnt, epsilon, True)
-    vertices = len(approx)
-    x, y, w, h = cv2.boundingRect(cnt)
-    aspect_ratio = float(w) / h if h > 0 else 0
-    hull = cv2.convexHull(cnt)
-    hull_area = cv2.contourArea(hull)
-    solidity = float(area) / hull_area if hull_area > 0 else 0
+    return float(circularity), len(approx)
 
-    if 0.85 <= circularity <= 1.15:
-        return "circle"
-    elif 0.4 <= circularity <= 0.7 and vertices == 3:
-        return "triangle"
-    elif 0.7 <= circularity <= 0.9 and vertices == 4:
-        return "square"
-    elif vertices > 6 and circularity > 0.8:
-        return "circle"  # Noisy circle contour
-    else:
-        # Fallback decision based on the number of vertices
-        if vertices == 3:
-            return "triangle"
-        elif vertices == 4:
-            return "square"
-        elif vertices <= 6:
-            return "circle"
-        else:
-            return "unknown"
+def classify_station_type(station_image):
+    """
+    Classifies the station type (circle, triangle, square) using more robust
+    shape features.
+    """
+    circularity, vertices = _station_shape_features(station_image)
+    if vertices < 0:
+        return "unknown"
+    return STATION_TYPES[_classify_shape(circularity, vertices)]
 
 def count_passengers_at_station(image, x, y, w, h):
     """
@@ -236,39 +626,49 @@ def count_passengers_at_station(image, x, y, w, h):
 # -----------------------------------------------------------
 # Modified detect_stations with Object Tracking
 # -----------------------------------------------------------
-def detect_stations(image, win_width, win_height, region=None):
+def detect_stations(image, win_width, win_height, region=None, gray=None, scale=1.0):
     """
     Detects stations on the map and applies tracking between frames.
+    With scale < 1 the candidates are searched on a resized copy of the map;
+    their boxes are mapped back and classified at full resolution.
     """
     if region is None:
         region = (0.00, 0.00, 1.00, 0.80)
     x, y, w, h = get_absolute_region(region, win_width, win_height)
-    roi = image[y:y+h, x:x+w]
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(gray, 100, 255, cv2.THRESH_BINARY_INV)
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    station_bboxes = []
-    for cnt in contours:
-        area = cv2.contourArea(cnt)
-        if area < 50 or area > 5000:
-            continue
-        bx, by, bw, bh = cv2.boundingRect(cnt)
-        if bw < 20 or bh < 20:
-            continue
-        station_bboxes.append((bx, by, bw, bh))
+    gray_roi = _gray_roi(image, gray, x, y, w, h)
+    search_roi = _resize_map(gray_roi, scale, "stations_map")
+    _, thresh = cv2.threshold(search_roi, 100, 255, cv2.THRESH_BINARY_INV,
+                              dst=_buffer("stations_thresh", search_roi.shape))
+    if cv2.countNonZero(thresh) < MIN_FOREGROUND_PIXELS * scale * scale:
+        return track_objects([], 'stations')
+    # Areas and bounding boxes of every blob in one call; the size filter then
+    # runs in NumPy and only the surviving candidates reach Python
+    _, _, stats, _ = cv2.connectedComponentsWithStats(thresh, connectivity=8)
+    stats = stats[1:]  # label 0 is the background
+    area_scale = scale * scale
+    keep = ((stats[:, cv2.CC_STAT_AREA] >= 50 * area_scale) & (stats[:, cv2.CC_STAT_AREA] <= 5000 * area_scale) &
+            (stats[:, cv2.CC_STAT_WIDTH] >= 20 * scale) & (stats[:, cv2.CC_STAT_HEIGHT] >= 20 * scale))
+    station_bboxes = stats[keep, :4]
+    if scale != 1.0:
+        station_bboxes = np.rint(station_bboxes / scale).astype(np.int32)
+    station_bboxes = station_bboxes.tolist()
+
+    # Extract the shape features of every candidate, then classify them in one batch
+    features = [_station_shape_features(gray_roi[by:by+bh, bx:bx+bw])
+                for bx, by, bw, bh in station_bboxes]
+    circularities = np.array([f[0] for f in features], dtype=np.float64)
+    vertices = np.array([f[1] for f in features], dtype=np.int64)
+    type_codes = _classify_shapes(circularities, vertices)
 
     stations = []
-    for i, (bx, by, bw, bh) in enumerate(station_bboxes):
-        station_roi = roi[by:by+bh, bx:bx+bw]
-        station_type = classify_station_type(station_roi)
+    for (bx, by, bw, bh), code in zip(station_bboxes, type_codes):
         passengers = count_passengers_at_station(image, bx, by, bw, bh)
         stations.append({
             'x': bx + bw // 2,
             'y': by + bh // 2,
             'width': bw,
             'height': bh,
-            'type': station_type,
+            'type': STATION_TYPES[code],
             'passengers': passengers
         })
 
@@ -278,7 +678,7 @@ def detect_stations(image, win_width, win_height, region=None):
 # -----------------------------------------------------------
 # Other detection functions (unchanged from previous implementation)
 # -----------------------------------------------------------
-def detect_placed_lines(image, win_width, win_height, region=None):
+def detect_placed_lines(image, win_width, win_height, region=None, gray=None):
     """
     Improved detection of placed lines with river handling and line consolidation.
     """
@@ -287,39 +687,46 @@ def detect_placed_lines(image, win_width, win_height, region=None):
     x, y, w, h = get_absolute_region(region, win_width, win_height)
     roi = image[y:y+h, x:x+w]
 
-    hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-    min_line_width = int(0.005 * w)
-    max_line_width = int(0.015 * w)
-    river_width = int(0.03 * w)
+    min_line_width, max_line_width, river_width = _line_params(w)
 
     lines_by_color = {}
 
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                   cv2.THRESH_BINARY_INV, 11, 2)
+    gray_roi = _gray_roi(image, gray, x, y, w, h)
+    thresh = cv2.adaptiveThreshold(gray_roi, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                   cv2.THRESH_BINARY_INV, 11, 2,
+                                   dst=_buffer("lines_thresh", gray_roi.shape))
+    if cv2.countNonZero(thresh) < MIN_FOREGROUND_PIXELS:
+        return []
     contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
+    segments = []
+    colors = []
+    # Reused by cv2.boxPoints for every contour instead of a fresh array each time
+    box_buf = _buffer("box_points", (4, 2), np.float32)
     for cnt in contours:
         rect = cv2.minAreaRect(cnt)
         width_rect = min(rect[1])
         if width_rect > river_width:
             continue
         if min_line_width <= width_rect <= max_line_width:
-            mask = np.zeros(roi.shape[:2], dtype=np.uint8)
-            cv2.drawContours(mask, [cnt], -1, 255, -1)
-            color = cv2.mean(roi, mask=mask)[:3]
-            color_key = tuple(map(lambda x: round(x / 20) * 20, color))
-            if color_key not in lines_by_color:
-                lines_by_color[color_key] = []
-            box = cv2.boxPoints(rect)
-            box = np.array(box).astype(int)
+            color = _contour_mean_color(roi, cnt)
+            cv2.boxPoints(rect, box_buf)
+            box = np.rint(box_buf, out=box_buf).astype(np.int32).tolist()
             start = tuple(box[0])
             end = tuple(box[2])
-            lines_by_color[color_key].append({
+            segments.append({
                 "start": start,
                 "end": end,
                 "color": color
             })
+            colors.append(color)
+
+    # Quantize every segment color to 20-step bins in a single NumPy call
+    # (np.rint rounds half to even, like the built-in round).
+    if colors:
+        color_keys = (np.rint(np.array(colors) / 20) * 20).astype(int).tolist()
+        for segment, color_key in zip(segments, color_keys):
+            lines_by_color.setdefault(tuple(color_key), []).append(segment)
 
     consolidated_lines = []
     for color, lines in lines_by_color.items():
@@ -331,7 +738,20 @@ def detect_placed_lines(image, win_width, win_height, region=None):
 
     return consolidated_lines
 
-def detect_trains(image, win_width, win_height, region=None):
+@njit(cache=True)
+def _train_candidates(areas, widths, heights, min_area, max_area, min_ratio, max_ratio):
+    """
+    Returns a boolean mask of the contours whose area and bounding-box aspect
+    ratio (width / height) fall within the train limits.
+    """
+    keep = np.zeros(len(areas), dtype=np.bool_)
+    for i in range(len(areas)):
+        if min_area <= areas[i] <= max_area and heights[i] > 0:
+            ratio = widths[i] / heights[i]
+            keep[i] = min_ratio <= ratio <= max_ratio
+    return keep
+
+def detect_trains(image, win_width, win_height, region=None, hsv=None):
     """
     Detects trains on the map.
     Trains appear as colored rectangles.
@@ -342,47 +762,53 @@ def detect_trains(image, win_width, win_height, region=None):
     trains = []
     x, y, w, h = get_absolute_region(region, win_width, win_height)
     roi = image[y:y+h, x:x+w]
-    hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+    hsv_roi = _hsv_roi(image, hsv, x, y, w, h)
 
     min_train_area = 100
     max_train_area = 2000
     min_aspect_ratio = 1.5
     max_aspect_ratio = 3.0
 
-    color_ranges = [
-        (np.array([20, 100, 100]), np.array([35, 255, 255])),
-        (np.array([0, 100, 100]), np.array([10, 255, 255])),
-        (np.array([100, 100, 100]), np.array([130, 255, 255])),
-        (np.array([10, 100, 100]), np.array([20, 255, 255]))
-    ]
-
-    combined_mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
-    for lower, upper in color_ranges:
-        mask = cv2.inRange(hsv, lower, upper)
-        combined_mask = cv2.bitwise_or(combined_mask, mask)
+    # Hue bands through the lookup table, saturation/value floor through
+    # inRange, combined in place
+    hue_mask = cv2.extractChannel(hsv_roi, 0, dst=_buffer("trains_hue_mask", hsv_roi.shape[:2]))
+    cv2.LUT(hue_mask, _TRAIN_HUE_LUT, dst=hue_mask)
+    combined_mask = cv2.inRange(hsv_roi, _TRAIN_SV_LOWER, _TRAIN_SV_UPPER,
+                                dst=_buffer("trains_mask", hsv_roi.shape[:2]))
+    cv2.bitwise_and(combined_mask, hue_mask, dst=combined_mask)
+    if cv2.countNonZero(combined_mask) < MIN_FOREGROUND_PIXELS:
+        return trains
 
     contours, _ = cv2.findContours(combined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    for cnt in contours:
-        area = cv2.contourArea(cnt)
-        if min_train_area <= area <= max_train_area:
-            bx, by, bw, bh = cv2.boundingRect(cnt)
-            aspect_ratio = bw / float(bh)
-            if min_aspect_ratio <= aspect_ratio <= max_aspect_ratio:
-                mask = np.zeros(roi.shape[:2], dtype=np.uint8)
-                cv2.drawContours(mask, [cnt], -1, 255, -1)
-                avg_color = cv2.mean(roi, mask=mask)[:3]
-                has_wagon = aspect_ratio > 2.2
-                trains.append({
-                    "position": (bx + bw // 2, by + bh // 2),
-                    "bbox": (bx, by, bw, bh),
-                    "color": tuple(map(int, avg_color)),
-                    "has_wagon": has_wagon
-                })
+    if not contours:
+        return trains
+
+    # A contour's area never exceeds its bounding box, so boxes smaller than a
+    # train (most of the mask noise) are rejected before contourArea
+    rects = np.array([cv2.boundingRect(cnt) for cnt in contours])
+    candidates = np.flatnonzero(rects[:, 2] * rects[:, 3] >= min_train_area)
+    # Size and shape filter over the remaining contours at once
+    areas = np.array([cv2.contourArea(contours[i]) for i in candidates], dtype=np.float64)
+    keep = _train_candidates(areas, rects[candidates, 2], rects[candidates, 3], min_train_area, max_train_area,
+                             min_aspect_ratio, max_aspect_ratio)
+
+    for i in candidates[keep]:
+        cnt = contours[i]
+        aspect_ratio = float(rects[i, 2]) / float(rects[i, 3])
+        bx, by, bw, bh = rects[i].tolist()
+        avg_color = _contour_mean_color(roi, cnt)
+        has_wagon = aspect_ratio > 2.2
+        trains.append({
+            "position": (bx + bw // 2, by + bh // 2),
+            "bbox": (bx, by, bw, bh),
+            "color": tuple(map(int, avg_color)),
+            "has_wagon": has_wagon
+        })
 
     return trains
 
-def detect_available_wagons(image, win_width, win_height, region=None):
+def detect_available_wagons(image, win_width, win_height, region=None, use_cache=True, gray=None):
     """
     Detects the number of available wagons near the train indicator using OCR.
     Default region: (0.10, 0.75, 0.20, 0.10)
@@ -390,24 +816,50 @@ def detect_available_wagons(image, win_width, win_height, region=None):
     if region is None:
         region = (0.10, 0.75, 0.20, 0.10)
     x, y, w, h = get_absolute_region(region, win_width, win_height)
-    roi = image[y:y+h, x:x+w]
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
-    config = "--psm 7 -c tessedit_char_whitelist=0123456789"
-    text = pytesseract.image_to_string(thresh, config=config)
-    digits = ''.join(filter(str.isdigit, text))
-    try:
-        return int(digits)
-    except ValueError:
-        return 0
+    thresh = _ocr_binary(image, gray, x, y, w, h)
+    return _read_number(thresh, use_cache=use_cache)
+
+# Demand icons are only a few pixels wide, so the polygon vertex count alone
+# cannot tell a pixelated circle from a square, and a cross approximates to
+# anything from 4 to 12 vertices. Crosses are the only concave icon (filled
+# circles stay above this solidity even when tiny), and squares fill their
+# bounding box where circles cover at most about pi/4 of it.
+DEMAND_CROSS_MAX_SOLIDITY = 0.8
+DEMAND_SQUARE_MIN_EXTENT = 0.9
+# Vertex counts that identify a convex demand icon on their own
+DEMAND_SHAPE_BY_VERTICES = {3: "triangle", 5: "bell"}
+
+def _classify_demand_shape(cnt, area):
+    """
+    Classifies one demand icon contour from its vertex count, solidity
+    (area / convex hull area) and extent (area / bounding box area).
+    Returns "circle", "square", "triangle", "bell", "cross" or "unidentified".
+    """
+    hull_area = cv2.contourArea(cv2.convexHull(cnt))
+    if hull_area > 0 and area / hull_area < DEMAND_CROSS_MAX_SOLIDITY:
+        return "cross"
+    peri = cv2.arcLength(cnt, True)
+    vertices = len(cv2.approxPolyDP(cnt, 0.04 * peri, True))
+    if vertices < 3:
+        return "unidentified"
+    shape = DEMAND_SHAPE_BY_VERTICES.get(vertices)
+    if shape is not None:
+        return shape
+    # The contour runs through pixel centers, so its box is one pixel smaller
+    _, _, w, h = cv2.boundingRect(cnt)
+    if area / max((w - 1) * (h - 1), 1) >= DEMAND_SQUARE_MIN_EXTENT:
+        return "square"
+    return "circle"
 
-def detect_station_demands(image, win_width, win_height, stations, region=None):
+def detect_station_demands(image, win_width, win_height, stations, region=None, gray=None):
     """
     For each detected station, examines a small region to the upper-right to detect
     passenger demand icons (small shapes similar to station shapes).
     Returns a list of dictionaries with "station_id" and "demands".
     """
-    demands = []
+    source = gray if gray is not None else image
+    crops = []
+    station_ids = []
     for idx, station in enumerate(stations):
         bx, by, bw, bh = station.get("bbox", (0, 0, 0, 0))
         dx = int(0.1 * bw)
@@ -416,34 +868,43 @@ def detect_station_demands(image, win_width, win_height, stations, region=None):
         region_y = max(by - dy, 0)
         region_w = dx * 2
         region_h = dy * 2
-        roi = image[region_y:region_y+region_h, region_x:region_x+region_w]
-        if roi.size == 0:
+        crop = source[region_y:region_y+region_h, region_x:region_x+region_w]
+        if crop.size == 0:
+            continue
+        crops.append(crop)
+        station_ids.append(idx)
+
+    if not crops:
+        return []
+
+    # Pack every demand region side by side into one mosaic so a single
+    # threshold + findContours call covers all stations. Gutters and padding
+    # are white, i.e. background once the threshold is inverted.
+    offsets = np.cumsum([0] + [crop.shape[1] + 1 for crop in crops])
+    mosaic_h = max(crop.shape[0] for crop in crops)
+    mosaic = np.full((mosaic_h, offsets[-1]) + crops[0].shape[2:], 255, dtype=np.uint8)
+    for crop, ox in zip(crops, offsets):
+        mosaic[:crop.shape[0], ox:ox+crop.shape[1]] = crop
+    if mosaic.ndim == 3:
+        mosaic = cv2.cvtColor(mosaic, cv2.COLOR_BGR2GRAY)
+
+    _, thresh = cv2.threshold(mosaic, 100, 255, cv2.THRESH_BINARY_INV)
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    station_demands = [[] for _ in crops]
+    # Station slot of each contour, from the x of its first point
+    slots = np.searchsorted(offsets, [cnt[0, 0, 0] for cnt in contours], side='right') - 1
+    for cnt, slot in zip(contours, slots):
+        area = cv2.contourArea(cnt)
+        if area < 5 or area > 100:
             continue
-        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-        _, thresh = cv2.threshold(gray, 100, 255, cv2.THRESH_BINARY_INV)
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        station_demands = []
-        for cnt in contours:
-            area = cv2.contourArea(cnt)
-            if area < 5 or area > 100:
-                continue
-            peri = cv2.arcLength(cnt, True)
-            approx = cv2.approxPolyDP(cnt, 0.04 * peri, True)
-            shape = "unidentified"
-            if len(approx) >= 8:
-                shape = "circle"
-            elif len(approx) == 4:
-                shape = "square"
-            elif len(approx) == 3:
-                shape = "triangle"
-            elif len(approx) == 5:
-                shape = "bell"
-            elif len(approx) == 6:
-                shape = "cross"
-            station_demands.append(shape)
+        station_demands[slot].append(_classify_demand_shape(cnt, area))
+
+    demands = []
+    for idx, shapes in zip(station_ids, station_demands):
         demands.append({
             "station_id": idx,
-            "demands": station_demands
+            "demands": shapes
         })
     return demands
 
@@ -461,22 +922,42 @@ def analyze_game_image(image, win_width, win_height, config_regions=None):
       - station_demands (list of passenger demands per station)
     """
     if config_regions is None:
-        config_regions = {
-            "score_region": (0.80, 0.00, 0.18, 0.10),
-            "train_region": (0.10, 0.85, 0.20, 0.10),
-            "tunnel_region": (0.70, 0.85, 0.20, 0.10),
-            "lines_region": (0.35, 0.85, 0.30, 0.10),
-            "station_map_region": (0.00, 0.00, 1.00, 0.80),
-            "wagon_region": (0.10, 0.75, 0.20, 0.10)
-        }
+        config_regions = DEFAULT_REGIONS
+    # Convert the frame once; every detector slices its region out of these
+    gray, hsv = _convert_frame(image)
+
+    # The OCR counters are binarized here and read together (one tesseract call
+    # for all the values that are not cached yet)
+    refresh_resources = (_resource_state["frame"] % RESOURCE_OCR_INTERVAL == 0
+                         or not _resource_state["values"])
+    _resource_state["frame"] += 1
+    ocr_fields = [(key, region_key) for key, region_key in OCR_FIELDS
+                  if refresh_resources or key not in RESOURCE_FIELDS]
+    ocr_binaries = []
+    for _, region_key in ocr_fields:
+        region = config_regions.get(region_key) or DEFAULT_REGIONS[region_key]
+        ocr_binaries.append(_ocr_binary(image, gray, *get_absolute_region(region, win_width, win_height)))
+    ocr_future = _DETECTOR_POOL.submit(_read_numbers, ocr_binaries)
+
+    map_region = config_regions.get("station_map_region")
+    futures = {
+        'available_lines': _DETECTOR_POOL.submit(detect_available_lines, image, win_width, win_height, config_regions.get("lines_region"), gray=gray, hsv=hsv),
+        'stations': _DETECTOR_POOL.submit(detect_stations, image, win_width, win_height, map_region, gray=gray,
+                                          scale=STATION_DETECTION_SCALE),
+        'placed_lines': _DETECTOR_POOL.submit(detect_placed_lines, image, win_width, win_height, map_region, gray=gray),
+        'trains': _DETECTOR_POOL.submit(detect_trains, image, win_width, win_height, map_region, hsv=hsv),
+    }
+
     analysis = {}
-    analysis['score'] = detect_score(image, win_width, win_height, config_regions.get("score_region"))
-    analysis['available_trains'] = detect_available_trains(image, win_width, win_height, config_regions.get("train_region"))
-    analysis['available_tunnels'] = detect_available_tunnels(image, win_width, win_height, config_regions.get("tunnel_region"))
-    analysis['available_lines'] = detect_available_lines(image, win_width, win_height, config_regions.get("lines_region"))
-    analysis['stations'] = detect_stations(image, win_width, win_height, config_regions.get("station_map_region"))
-    analysis['placed_lines'] = detect_placed_lines(image, win_width, win_height, config_regions.get("station_map_region"))
-    analysis['trains'] = detect_trains(image, win_width, win_height, config_regions.get("station_map_region"))
-    analysis['available_wagons'] = detect_available_wagons(image, win_width, win_height, config_regions.get("wagon_region"))
-    analysis['station_demands'] = detect_station_demands(image, win_width, win_height, analysis['stations'])
+    # Demands need the detected stations, so they start once those are known
+    analysis['stations'] = futures['stations'].result()
+    futures['station_demands'] = _DETECTOR_POOL.submit(detect_station_demands, image, win_width, win_height, analysis['stations'], gray=gray)
+    for (key, _), value in zip(ocr_fields, ocr_future.result()):
+        analysis[key] = value
+    if refresh_resources:
+        _resource_state["values"] = {key: analysis[key] for key in RESOURCE_FIELDS}
+    else:
+        analysis.update(_resource_state["values"])
+    for key in ('available_lines', 'stations', 'placed_lines', 'trains', 'station_demands'):
+        analysis[key] = futures[key].result()
     return analysis
@@ -1,10 +1,8 @@
 import time
-import threading
+import queue
 import subprocess
-import pyautogui
+import multiprocessing as mp
 import keyboard
-import pygetwindow as gw
-import cv2
 import numpy as np
 import tkinter as tk
 from tkinter import messagebox, ttk
@@ -12,7 +10,7 @@ import logging
 from datetime import datetime
 import json
 import os
-from detectors_py import analyze_game_image
+from analysis_worker import analysis_loop, RESULT_QUEUE_SIZE
 
 
 # ----------------------- Logger Setup -----------------------
@@ -34,14 +32,29 @@ def setup_logger():
 MAX_CONSECUTIVE_ERRORS = 5
 error_count = 0
 last_valid_data = None
+APP_TITLE = "Mini Metro Real-Time Analysis"
+# True while the worker reports the game window as minimized
+game_hidden = False
 
 history_data = {
     'times': [],
     'scores': [],
     'passengers': []
 }
+# The history keeps every sample, but the graph is redrawn at most this many
+# times per second
+MAX_GRAPH_REDRAW_RATE = 5
+last_graph_draw = 0.0
+# Set when samples arrived while the window was minimized; the graph is
+# redrawn once when the window is mapped again
+graph_dirty = False
+# Variable updates waiting for the next idle flush, by variable name
+pending_var_updates = {}
+# Text last written to each tk variable, by variable name
+last_var_values = {}
 
 UPDATE_INTERVAL = 2000  # in milliseconds
+RESULT_POLL_INTERVAL = 100  # how often the GUI collects the worker's results, in milliseconds
 CONFIG_FILE = "regions_config.json"
 if os.path.exists(CONFIG_FILE):
     try:
@@ -69,39 +82,29 @@ else:
 
 analysis_running = False
 visualizer_proc = None
+# Analysis process and the objects shared with it (see start_analysis_worker)
+analysis_proc = None
+analysis_results = None
+analysis_flag = None
+analysis_interval = None
 manual_entry = None  # Will be set in the UI section
 
 
 # ----------------------- Utility Functions -----------------------
-def find_game_window():
+def start_analysis_worker():
     """
-    Searches for the "Mini Metro" game window, activates it, and returns its position.
-    Returns (left, top, width, height) if found; otherwise, returns None.
+    Starts the capture and analysis process.
+    The GUI toggles it through analysis_flag, changes its pace through
+    analysis_interval and receives its results on analysis_results.
     """
-    windows = gw.getWindowsWithTitle("Mini Metro")
-    for w in windows:
-        if w.title.strip() == "Mini Metro":
-            try:
-                w.activate()
-                time.sleep(0.1)
-            except Exception as e:
-                logging.error(f"Error activating game window: {e}", exc_info=True)
-            return (w.left, w.top, w.width, w.height)
-    return None
-
-
-def capture_game_window(window_box):
-    """
-    Captures a screenshot of the specified window region.
-    Returns an OpenCV BGR image, or None if an error occurs.
-    """
-    try:
-        screenshot = pyautogui.screenshot(region=window_box)
-        image = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-        return image
-    except Exception as e:
-        logging.error(f"Error capturing window: {e}", exc_info=True)
-        return None
+    global analysis_proc, analysis_results, analysis_flag, analysis_interval
+    analysis_results = mp.Queue(maxsize=RESULT_QUEUE_SIZE)
+    analysis_flag = mp.Event()
+    analysis_interval = mp.Value('i', UPDATE_INTERVAL)
+    analysis_proc = mp.Process(target=analysis_loop,
+                               args=(analysis_results, analysis_flag, analysis_interval, detection_regions),
+                               daemon=True)
+    analysis_proc.start()
 
 
 def launch_visualizer():
@@ -146,9 +149,9 @@ def show_error_dialog(title, message):
 
 def schedule_update():
     """
-    Schedules the next update_analysis call after UPDATE_INTERVAL milliseconds.
+    Schedules the next update_analysis call after RESULT_POLL_INTERVAL milliseconds.
     """
-    root.after(UPDATE_INTERVAL, update_analysis)
+    root.after(RESULT_POLL_INTERVAL, update_analysis)
 
 
 def validate_data(data):
@@ -166,7 +169,11 @@ def validate_data(data):
 def update_history_graph(data):
     """
     Updates the historical graph with the new data.
+    The sample is always recorded; the canvas is only redrawn if the last
+    redraw is older than 1 / MAX_GRAPH_REDRAW_RATE seconds and the window is
+    not minimized (on_window_mapped redraws it when it is restored).
     """
+    global graph_dirty
     current_time = datetime.now()
     history_data['times'].append(current_time)
     history_data['scores'].append(data.get('score', 0))
@@ -175,109 +182,188 @@ def update_history_graph(data):
         history_data['times'].pop(0)
         history_data['scores'].pop(0)
         history_data['passengers'].pop(0)
+    if root.state() == "iconic":
+        graph_dirty = True
+        return
+    if time.monotonic() - last_graph_draw < 1 / MAX_GRAPH_REDRAW_RATE:
+        return
+    redraw_history_graph()
+
+
+def redraw_history_graph():
+    """
+    Draws the recorded score history on the statistics canvas.
+    """
+    global last_graph_draw, graph_dirty
+    last_graph_draw = time.monotonic()
+    graph_dirty = False
     canvas = detail_vars['stats_canvas']
-    canvas.delete("all")
     max_score = max(history_data['scores']) * 1.1 if history_data['scores'] else 100
     draw_line_graph(canvas, history_data['times'], history_data['scores'], color="blue", max_value=max_score)
-    canvas.create_text(250, 20, text="Score Evolution", fill="black")
+    if not canvas.find_withtag("graph_title"):
+        canvas.create_text(250, 20, text="Score Evolution", fill="black", tags="graph_title")
+
 
+def on_window_mapped(event):
+    """
+    Redraws the history graph once when the main window is restored, if
+    samples were recorded while it was minimized.
+    """
+    if event.widget is root and graph_dirty:
+        redraw_history_graph()
 
-def draw_line_graph(canvas, x_data, y_data, color="blue", max_value=None):
+
+def draw_line_graph(canvas, x_data, y_data, color="blue", max_value=None, tag="line_graph"):
     """
     Draws a simple line graph on the given canvas.
+    The line is a single canvas item (found by its tag) whose coordinates are
+    replaced on each call, instead of a new item per update.
     """
     width = canvas.winfo_width()
     height = canvas.winfo_height()
     if not max_value:
-        max_value = max(y_data) if y_data else 100
-    points = []
-    for i, y in enumerate(y_data):
-        x_pos = int(i * width / (len(x_data) - 1 if len(x_data) > 1 else 1))
-        y_pos = int(height - (y / max_value) * (height - 40))
-        points.append((x_pos, y_pos))
-    if len(points) > 1:
-        flat_points = []
-        for p in points:
-            flat_points.extend(p)
-        canvas.create_line(flat_points, fill=color, width=2)
+        max_value = max(y_data, default=0) or 100
+    items = canvas.find_withtag(tag)
+    line_id = items[0] if items else canvas.create_line(0, 0, 0, 0, fill=color, width=2, tags=tag)
+    if len(y_data) < 2:
+        canvas.itemconfigure(line_id, state="hidden")
+        return
+    ys = np.asarray(y_data, dtype=np.float64)
+    x_pos = (np.arange(len(ys)) * width / (len(x_data) - 1 if len(x_data) > 1 else 1)).astype(int)
+    y_pos = (height - (ys / max_value) * (height - 40)).astype(int)
+    canvas.coords(line_id, np.column_stack((x_pos, y_pos)).ravel().tolist())
+    canvas.itemconfigure(line_id, fill=color, state="normal")
+
+
+def _set_var(var, value):
+    """
+    Queues the new text of a tk variable. All the variables of one UI update
+    are applied together by a single idle callback (_flush_var_updates).
+    Unchanged texts are dropped here, without a call into Tcl.
+    """
+    text = str(value)
+    name = str(var)
+    if name not in pending_var_updates and last_var_values.get(name) == text:
+        return
+    if not pending_var_updates:
+        root.after_idle(_flush_var_updates)
+    pending_var_updates[name] = (var, text)
+
+
+def _flush_var_updates():
+    """
+    Applies the variable updates queued by _set_var.
+    A variable is only set when its text changes, so an unchanged game state
+    does not fire variable traces and label redraws every frame.
+    """
+    updates = list(pending_var_updates.items())
+    pending_var_updates.clear()
+    for name, (var, text) in updates:
+        if last_var_values.get(name) != text:
+            var.set(text)
+            last_var_values[name] = text
 
 
 def update_ui_with_data(data):
     """
     Updates both the main UI and the detailed section with the analysis data.
     """
-    score_var.set(str(data.get('score', 'N/A')))
-    trains_var.set(str(data.get('available_trains', 'N/A')))
-    tunnels_var.set(str(data.get('available_tunnels', 'N/A')))
+    _set_var(score_var, data.get('score', 'N/A'))
+    _set_var(trains_var, data.get('available_trains', 'N/A'))
+    _set_var(tunnels_var, data.get('available_tunnels', 'N/A'))
 
     avail_lines = data.get('available_lines', {})
-    lines_avail_var.set("Avail: " + str(avail_lines.get("available", 'N/A')))
-    lines_locked_var.set("Locked: " + str(avail_lines.get("locked", 'N/A')))
+    _set_var(lines_avail_var, "Avail: " + str(avail_lines.get("available", 'N/A')))
+    _set_var(lines_locked_var, "Locked: " + str(avail_lines.get("locked", 'N/A')))
 
     stations = data.get('stations', [])
-    stations_var.set(f"{len(stations)} detected")
+    _set_var(stations_var, f"{len(stations)} detected")
 
     placed_lines = data.get('placed_lines', [])
-    placed_lines_var.set(f"{len(placed_lines)} detected")
+    _set_var(placed_lines_var, f"{len(placed_lines)} detected")
 
     trains = data.get('trains', [])
     train_info = f"{len(trains)} detected"
     if trains:
         wagon_count = sum(1 for t in trains if t.get('has_wagon'))
         train_info += f" (wagons: {wagon_count})"
-    trains_detected_var.set(train_info)
-    wagons_var.set(str(data.get('available_wagons', 'N/A')))
+    _set_var(trains_detected_var, train_info)
+    _set_var(wagons_var, data.get('available_wagons', 'N/A'))
 
     # Update detailed information if available
     if 'station_types' in data:
-        detail_vars['station_types'].set(
+        _set_var(detail_vars['station_types'],
             f"Circle: {data['station_types'].get('circle', 0)}, "
             f"Triangle: {data['station_types'].get('triangle', 0)}, "
             f"Square: {data['station_types'].get('square', 0)}"
         )
     if 'passenger_counts' in data:
-        detail_vars['passenger_counts'].set(str(data['passenger_counts']))
+        _set_var(detail_vars['passenger_counts'], data['passenger_counts'])
     if 'line_efficiency' in data:
-        detail_vars['line_efficiency'].set(str(data['line_efficiency']))
+        _set_var(detail_vars['line_efficiency'], data['line_efficiency'])
 
     update_history_graph(data)
 
 
-def update_analysis():
+def set_game_hidden(hidden):
     """
-    Main analysis function with error recovery.
-    It captures the screen, analyzes the image, validates the data, and updates the UI.
-    In case of errors, it uses a recovery mechanism after MAX_CONSECUTIVE_ERRORS failures.
+    Records whether the worker skips frames because the game window is
+    minimized. The change is logged once and shown in the window title, so a
+    paused analysis is not mistaken for a stalled one.
     """
-    global error_count, last_valid_data
-    if not analysis_running:
-        schedule_update()
+    global game_hidden
+    if hidden == game_hidden:
         return
+    game_hidden = hidden
+    if hidden:
+        logging.info("Analysis paused: the game window is minimized.")
+        root.title(f"{APP_TITLE} (paused - game minimized)")
+    else:
+        logging.info("Game window restored, analysis resumed.")
+        root.title(APP_TITLE)
 
-    window_box = find_game_window()
-    if window_box is None:
-        logging.warning("Mini Metro game window not found.")
-        schedule_update()
-        return
 
-    try:
-        image = capture_game_window(window_box)
-        if image is None:
+def update_analysis():
+    """
+    Collects the messages posted by the analysis process, validates the latest
+    analysis and updates the UI.
+    Failures reported by the worker go through the recovery mechanism after
+    MAX_CONSECUTIVE_ERRORS consecutive errors.
+    """
+    global error_count, last_valid_data
+    data = None
+    while True:
+        try:
+            kind, payload = analysis_results.get_nowait()
+        except queue.Empty:
+            break
+        if kind == "data":
+            error_count = 0  # Reset error count on success
+            set_game_hidden(False)
+            data = payload
+        elif kind == "hidden":
+            set_game_hidden(True)
+        elif kind == "no_window":
+            logging.warning("Mini Metro game window not found.")
+        elif kind == "capture_failed":
             error_count += 1
             logging.warning(f"Screenshot capture failed. Attempt {error_count}/{MAX_CONSECUTIVE_ERRORS}")
             if error_count >= MAX_CONSECUTIVE_ERRORS:
                 logging.error("Too many consecutive errors. Recalibration needed.")
                 show_recalibration_prompt()
                 error_count = 0
-            else:
-                if last_valid_data:
-                    update_ui_with_data(last_valid_data)
-                schedule_update()
-                return
-        else:
-            error_count = 0  # Reset error count on success
+            elif last_valid_data:
+                update_ui_with_data(last_valid_data)
+        elif kind == "error":
+            message, details = payload
+            error_count += 1
+            logging.error(f"Error in analysis loop: {message}\n{details}")
+            if error_count >= MAX_CONSECUTIVE_ERRORS:
+                logging.critical("Critical error - too many consecutive errors")
+                show_error_dialog("Critical Error", f"Analysis encountered too many consecutive errors. Details: {message}")
+                error_count = 0
 
-        data = analyze_game_image(image, window_box[2], window_box[3], detection_regions)
+    if data is not None:
         if validate_data(data):
             last_valid_data = data
             update_ui_with_data(data)
@@ -285,13 +371,6 @@ def update_analysis():
             logging.warning("Inconsistent data detected")
             if last_valid_data:
                 update_ui_with_data(last_valid_data)
-    except Exception as e:
-        error_count += 1
-        logging.error(f"Error in analysis loop: {e}", exc_info=True)
-        if error_count >= MAX_CONSECUTIVE_ERRORS:
-            logging.critical("Critical error - too many consecutive errors")
-            show_error_dialog("Critical Error", f"Analysis encountered too many consecutive errors. Details: {str(e)}")
-            error_count = 0
 
     schedule_update()
 
@@ -303,8 +382,11 @@ def toggle_analysis():
     global analysis_running
     analysis_running = not analysis_running
     if analysis_running:
+        analysis_flag.set()
         logging.info("Analysis started.")
     else:
+        analysis_flag.clear()
+        set_game_hidden(False)
         logging.info("Analysis stopped.")
 
 
@@ -321,6 +403,7 @@ def apply_settings():
             new_val = update_interval_var.get()
         update_interval_var.set(new_val)
         UPDATE_INTERVAL = new_val
+        analysis_interval.value = new_val
         logging.info(f"New update interval set to {UPDATE_INTERVAL} ms")
     except ValueError:
         logging.error("Invalid manual input for update interval", exc_info=True)
@@ -347,38 +430,40 @@ def setup_detailed_ui():
     basic_frame = ttk.Frame(main_frame)
     basic_frame.pack(pady=10)
 
+    # The fields only display analysis results: they are read-only so that
+    # _set_var's record of the last written texts always matches them
     ttk.Label(basic_frame, text="Score:").grid(row=0, column=0, sticky="e")
-    score_entry = ttk.Entry(basic_frame, textvariable=score_var, width=20)
+    score_entry = ttk.Entry(basic_frame, textvariable=score_var, width=20, state="readonly")
     score_entry.grid(row=0, column=1)
 
     ttk.Label(basic_frame, text="Available Trains:").grid(row=1, column=0, sticky="e")
-    trains_entry = ttk.Entry(basic_frame, textvariable=trains_var, width=20)
+    trains_entry = ttk.Entry(basic_frame, textvariable=trains_var, width=20, state="readonly")
     trains_entry.grid(row=1, column=1)
 
     ttk.Label(basic_frame, text="Available Tunnels:").grid(row=2, column=0, sticky="e")
-    tunnels_entry = ttk.Entry(basic_frame, textvariable=tunnels_var, width=20)
+    tunnels_entry = ttk.Entry(basic_frame, textvariable=tunnels_var, width=20, state="readonly")
     tunnels_entry.grid(row=2, column=1)
 
     ttk.Label(basic_frame, text="Available Metro Lines:").grid(row=3, column=0, sticky="e")
-    lines_avail_entry = ttk.Entry(basic_frame, textvariable=lines_avail_var, width=10)
+    lines_avail_entry = ttk.Entry(basic_frame, textvariable=lines_avail_var, width=10, state="readonly")
     lines_avail_entry.grid(row=3, column=1, sticky="w")
-    lines_locked_entry = ttk.Entry(basic_frame, textvariable=lines_locked_var, width=10)
+    lines_locked_entry = ttk.Entry(basic_frame, textvariable=lines_locked_var, width=10, state="readonly")
     lines_locked_entry.grid(row=3, column=2, sticky="e")
 
     ttk.Label(basic_frame, text="Stations Detected:").grid(row=4, column=0, sticky="e")
-    stations_entry = ttk.Entry(basic_frame, textvariable=stations_var, width=30)
+    stations_entry = ttk.Entry(basic_frame, textvariable=stations_var, width=30, state="readonly")
     stations_entry.grid(row=4, column=1)
 
     ttk.Label(basic_frame, text="Placed Lines Detected:").grid(row=5, column=0, sticky="e")
-    placed_lines_entry = ttk.Entry(basic_frame, textvariable=placed_lines_var, width=30)
+    placed_lines_entry = ttk.Entry(basic_frame, textvariable=placed_lines_var, width=30, state="readonly")
     placed_lines_entry.grid(row=5, column=1)
 
     ttk.Label(basic_frame, text="Trains on Map:").grid(row=6, column=0, sticky="e")
-    trains_detected_entry = ttk.Entry(basic_frame, textvariable=trains_detected_var, width=30)
+    trains_detected_entry = ttk.Entry(basic_frame, textvariable=trains_detected_var, width=30, state="readonly")
     trains_detected_entry.grid(row=6, column=1)
 
     ttk.Label(basic_frame, text="Available Wagons:").grid(row=7, column=0, sticky="e")
-    wagons_entry = ttk.Entry(basic_frame, textvariable=wagons_var, width=20)
+    wagons_entry = ttk.Entry(basic_frame, textvariable=wagons_var, width=20, state="readonly")
     wagons_entry.grid(row=7, column=1)
 
     # Manual update button
@@ -444,34 +529,12 @@ def setup_detailed_ui():
     }
 
 
-# ----------------------- Main Interface Creation -----------------------
-root = tk.Tk()
-root.title("Mini Metro Real-Time Analysis")
-
-# Variable for update interval
-update_interval_var = tk.IntVar(root, value=UPDATE_INTERVAL)
-
-# Variables for main data display
-score_var = tk.StringVar()
-trains_var = tk.StringVar()
-tunnels_var = tk.StringVar()
-lines_avail_var = tk.StringVar()
-lines_locked_var = tk.StringVar()
-stations_var = tk.StringVar()
-placed_lines_var = tk.StringVar()
-trains_detected_var = tk.StringVar()
-wagons_var = tk.StringVar()
-
-# Create the detailed interface (Main and Details tabs)
-detail_vars = setup_detailed_ui()
-
-# ----------------------- Keyboard Shortcut and Scheduling -----------------------
-keyboard.add_hotkey('shift+r', toggle_analysis)
-root.after(UPDATE_INTERVAL, update_analysis)
-
-
 def on_closing():
     global visualizer_proc
+    # Release the global hotkey hooks before the window goes away
+    keyboard.unhook_all()
+    if analysis_proc:
+        analysis_proc.terminate()
     if visualizer_proc:
         try:
             visualizer_proc.terminate()
@@ -481,10 +544,39 @@ def on_closing():
     os._exit(0)
 
 
-root.protocol("WM_DELETE_WINDOW", on_closing)
-
 # ----------------------- Application Startup -----------------------
+# The interface is only built in the main process: the analysis process
+# imports this module again when it is spawned (Windows)
 if __name__ == "__main__":
     setup_logger()
     logging.info("Starting application")
+
+    # ----------------------- Main Interface Creation -----------------------
+    root = tk.Tk()
+    root.title(APP_TITLE)
+
+    # Variable for update interval
+    update_interval_var = tk.IntVar(root, value=UPDATE_INTERVAL)
+
+    # Variables for main data display
+    score_var = tk.StringVar()
+    trains_var = tk.StringVar()
+    tunnels_var = tk.StringVar()
+    lines_avail_var = tk.StringVar()
+    lines_locked_var = tk.StringVar()
+    stations_var = tk.StringVar()
+    placed_lines_var = tk.StringVar()
+    trains_detected_var = tk.StringVar()
+    wagons_var = tk.StringVar()
+
+    # Create the detailed interface (Main and Details tabs)
+    detail_vars = setup_detailed_ui()
+
+    # ----------------------- Keyboard Shortcut and Scheduling -----------------------
+    keyboard.add_hotkey('shift+r', toggle_analysis)
+    start_analysis_worker()
+    schedule_update()
+
+    root.bind("<Map>", on_window_mapped)
+    root.protocol("WM_DELETE_WINDOW", on_closing)
     root.mainloop()
@@ -4,7 +4,9 @@ import numpy as np
 import os
 from detectors_py import (
     detect_score, detect_stations, detect_trains,
-    classify_station_type, count_passengers_at_station
+    classify_station_type, count_passengers_at_station,
+    track_objects, previous_objects, TrackedSet, detect_station_demands,
+    _ocr_binary
 )
 
 
@@ -89,6 +91,75 @@ class DetectorsTest(unittest.TestCase):
         count = count_passengers_at_station(img, 70, 70, 60, 60)
         self.assertEqual(count, 5, "Devrait compter 5 passagers")
 
+    def test_object_tracking(self):
+        """Teste le suivi des objets entre deux images"""
+        previous_objects["trains"] = TrackedSet()
+
+        first = track_objects([{"x": 10, "y": 10}, {"x": 200, "y": 200}], "trains")
+        self.assertEqual([obj["id"] for obj in first], [0, 1], "Les premiers objets devraient recevoir un id")
+
+        # Deux objets proches du premier train : seul le plus proche garde son id
+        second = track_objects([{"x": 14, "y": 10}, {"x": 12, "y": 10}, {"x": 201, "y": 200}], "trains")
+        matched = {(obj["x"], obj["y"]): obj for obj in second}
+        self.assertEqual(matched[(12, 10)]["id"], 0, "Le train le plus proche devrait garder l'id 0")
+        self.assertEqual(matched[(12, 10)]["age"], 2)
+        self.assertEqual(matched[(201, 200)]["id"], 1, "Le second train devrait garder l'id 1")
+        self.assertEqual(matched[(14, 10)]["age"], 1, "Le train en trop devrait être un nouvel objet")
+
+        previous_objects["trains"] = TrackedSet()
+
+    def test_station_demands(self):
+        """Teste la détection des demandes de passagers près des stations"""
+        img = np.full((200, 600, 3), 255, dtype=np.uint8)
+        # Une icône en haut à droite de chaque station : rond, carré puis triangle
+        cv2.circle(img, (150, 50), 5, (0, 0, 0), -1)
+        cv2.rectangle(img, (345, 45), (354, 54), (0, 0, 0), -1)
+        cv2.fillPoly(img, [np.array([[550, 45], [545, 55], [555, 55]], np.int32)], (0, 0, 0))
+        stations = [{"bbox": (x, 50, 100, 100)} for x in (50, 250, 450)]
+
+        demands = detect_station_demands(img, 600, 200, stations)
+        self.assertEqual(demands, [
+            {"station_id": 0, "demands": ["circle"]},
+            {"station_id": 1, "demands": ["square"]},
+            {"station_id": 2, "demands": ["triangle"]}
+        ], "Devrait détecter un cercle, un carré puis un triangle")
+
+    def test_station_demand_small_icons(self):
+        """Teste les icônes de demande que le seul nombre de sommets confond"""
+        img = np.full((200, 400, 3), 255, dtype=np.uint8)
+        # Croix fine (12 sommets) puis petit rond anti-aliasé (6 sommets)
+        cv2.rectangle(img, (149, 45), (151, 55), (0, 0, 0), -1)
+        cv2.rectangle(img, (145, 49), (155, 51), (0, 0, 0), -1)
+        cv2.circle(img, (350, 50), 4, (0, 0, 0), -1, cv2.LINE_AA)
+        stations = [{"bbox": (x, 50, 100, 100)} for x in (50, 250)]
+
+        demands = detect_station_demands(img, 400, 200, stations)
+        self.assertEqual(demands, [
+            {"station_id": 0, "demands": ["cross"]},
+            {"station_id": 1, "demands": ["circle"]}
+        ], "Devrait détecter une croix puis un cercle")
+
+    def test_ocr_binary_polarity(self):
+        """Teste que le texte clair sur fond sombre est binarisé comme le texte sombre sur fond clair"""
+        light_on_dark = self.test_score_image
+        dark_on_light = cv2.bitwise_not(light_on_dark)
+
+        first = _ocr_binary(light_on_dark, None, 0, 0, 200, 100)
+        second = _ocr_binary(dark_on_light, None, 0, 0, 200, 100)
+        self.assertGreater(cv2.countNonZero(first), first.size // 2, "Le fond devrait être blanc")
+        self.assertTrue(np.array_equal(first, second), "Les deux polarités devraient donner la même image")
+
+    def test_train_colors(self):
+        """Teste la détection des trains de part et d'autre du bouclage de la teinte"""
+        img = np.full((720, 1280, 3), 235, dtype=np.uint8)
+        # Rouge à teinte 0 et rouge à teinte ~174 (de l'autre côté du bouclage)
+        cv2.rectangle(img, (100, 100), (136, 116), (20, 20, 220), -1)
+        cv2.rectangle(img, (300, 300), (336, 316), (60, 20, 220), -1)
+
+        trains = detect_trains(img, 1280, 720)
+        self.assertEqual(sorted(t["bbox"] for t in trains), [(100, 100, 37, 17), (300, 300, 37, 17)],
+                         "Les deux trains rouges devraient être détectés")
+
 
 # Exécuter les tests si le fichier est lancé directement
 if __name__ == "__main__":
@@ -1,13 +1,14 @@
 import tkinter as tk
 from tkinter import messagebox
 from PIL import Image, ImageTk
-import pyautogui
 import cv2
 import numpy as np
 import pygetwindow as gw
 import json
 import os
 from detectors_py import get_absolute_region, analyze_game_image
+# Same capture as the analyzer: persistent mss grabber, pyautogui fallback
+from analysis_worker import capture_game_window
 
 CONFIG_FILE = "regions_config.json"
 
@@ -52,16 +53,6 @@ def find_game_window():
     return None
 
 
-def capture_game_window(window_box):
-    """
-    Captures a screenshot of the specified window region.
-    Returns an OpenCV BGR image.
-    """
-    screenshot = pyautogui.screenshot(region=window_box)
-    image = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-    return image
-
-
 def cv2_to_tk(image):
     """
     Converts an OpenCV BGR image to an ImageTk.PhotoImage.
@@ -109,13 +100,15 @@ class VisualizerApp(tk.Tk):
         row += 1
 
         self.photo = None
+        # Window size the region layer was rendered for
+        self.region_layer_size = None
         self.refresh_image()
 
     def refresh_image(self):
         """
         Captures a fresh screenshot (with the game window in the foreground),
-        clears the canvas, draws detection region overlays, and overlays
-        the detection results (stations, station demands, trains, and lines).
+        draws detection region overlays, overlays the detection results
+        (stations, station demands, trains, and lines) and shows it on the canvas.
         """
         self.window_box = find_game_window()
         if not self.window_box:
@@ -123,19 +116,15 @@ class VisualizerApp(tk.Tk):
             return
         self.left, self.top, self.win_width, self.win_height = self.window_box
         base_image = capture_game_window(self.window_box)
+        if base_image is None:
+            print("Screenshot capture failed!")
+            return
         overlay = base_image.copy()
-        self.canvas.delete("all")
-        # Draw detection region rectangles
-        for region_name, var in self.region_vars.items():
-            try:
-                rel_values = [float(x.strip()) for x in var.get().split(",")]
-                detection_regions[region_name] = rel_values
-                x, y, w, h = get_absolute_region(rel_values, self.win_width, self.win_height)
-                cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                cv2.putText(overlay, region_name, (x, y - 5),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-            except Exception as e:
-                print(f"Error drawing {region_name}: {e}")
+        if self.region_layer_size != (self.win_width, self.win_height):
+            self.update_region_layer()
+        # Detection region rectangles: paste the pre-rendered layer
+        if self.region_layer.shape[:2] == overlay.shape[:2]:
+            cv2.copyTo(self.region_layer, self.region_mask, dst=overlay)
         # Run analysis with the current configuration and overlay results
         analysis = analyze_game_image(base_image, self.win_width, self.win_height, detection_regions)
         # Overlay stations: draw a circle and label with shape
@@ -166,7 +155,33 @@ class VisualizerApp(tk.Tk):
                 cv2.line(overlay, segment["start"], segment["end"], line_data["color"], 2)
         self.photo = cv2_to_tk(overlay)
         self.canvas.config(width=self.win_width, height=self.win_height)
-        self.canvas.create_image(0, 0, anchor="nw", image=self.photo)
+        # The screenshot is a single canvas item: swap its image instead of
+        # deleting and re-creating it on every refresh
+        if self.canvas.find_withtag("screenshot"):
+            self.canvas.itemconfigure("screenshot", image=self.photo)
+        else:
+            self.canvas.create_image(0, 0, anchor="nw", image=self.photo, tags="screenshot")
+
+    def update_region_layer(self):
+        """
+        Renders the detection regions, as absolute pixel rectangles for the
+        current window size, with their labels into a layer
+        (and its mask) that refresh_image pastes over each screenshot.
+        Only needed when the regions are applied or the game window is
+        resized, not on every refresh.
+        """
+        self.region_layer = np.zeros((self.win_height, self.win_width, 3), dtype=np.uint8)
+        for region_name, rel_coords in detection_regions.items():
+            try:
+                x, y, w, h = get_absolute_region(rel_coords, self.win_width, self.win_height)
+                cv2.rectangle(self.region_layer, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                # Aliased text: the layer is pasted through a mask, not blended
+                cv2.putText(self.region_layer, region_name, (x, y - 5),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1, cv2.LINE_8)
+            except Exception as e:
+                print(f"Error drawing {region_name}: {e}")
+        self.region_mask = np.ascontiguousarray(self.region_layer[:, :, 1])
+        self.region_layer_size = (self.win_width, self.win_height)
 
     def apply_changes(self):
         """
@@ -182,6 +197,7 @@ class VisualizerApp(tk.Tk):
                     detection_regions[region_name] = new_coords
             except Exception as e:
                 print(f"Error updating {region_name}: {e}")
+        self.update_region_layer()
         try:
             with open(CONFIG_FILE, "w") as f:
                 json.dump(detection_regions, f)